@@ -0,0 +1,88 @@
+"""Import-time benchmark of the backend.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter,
+reports the modules with the largest cumulative import time and fails when
+the total exceeds the regression budget.
+
+Usage:
+    uv run poe import-time
+    python scripts/import_time.py --module backend.api --budget-ms 800 --top 25
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+from dataclasses import dataclass
+
+
+@dataclass
+class ImportTiming:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def measure(module: str, runs: int) -> list[ImportTiming]:
+    """Returns the timings of the fastest of `runs` fresh imports of `module`."""
+    best: list[ImportTiming] | None = None
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+            check=False,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"importing {module} failed:\n{proc.stderr}")
+        timings = parse(proc.stderr)
+        if best is None or _total(best, module) > _total(timings, module):
+            best = timings
+    assert best is not None
+    return best
+
+
+def parse(stderr: str) -> list[ImportTiming]:
+    timings: list[ImportTiming] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        timings.append(ImportTiming(name.strip(), int(self_us), int(cumulative_us), depth))
+    return timings
+
+
+def _total(timings: list[ImportTiming], module: str) -> int:
+    return next((t.cumulative_us for t in timings if t.module == module), 0)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="backend.api", help="module to import")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", "800")))
+    parser.add_argument("--top", type=int, default=20, help="number of modules to report")
+    parser.add_argument("--runs", type=int, default=3, help="fresh imports to run, the fastest is reported")
+    args = parser.parse_args()
+
+    timings = measure(args.module, args.runs)
+    total_ms = _total(timings, args.module) / 1000
+
+    out = sys.stdout
+    out.write(f"{'cumulative [ms]':>16} {'self [ms]':>10}  module\n")
+    for t in sorted(timings, key=lambda t: t.cumulative_us, reverse=True)[: args.top]:
+        out.write(f"{t.cumulative_us / 1000:>16.1f} {t.self_us / 1000:>10.1f}  {'  ' * t.depth}{t.module}\n")
+
+    out.write(f"\nimport {args.module}: {total_ms:.1f} ms (budget {args.budget_ms:.1f} ms)\n")
+    if total_ms > args.budget_ms:
+        out.write("import time budget exceeded\n")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+"""Opt-in response cache for deterministic LLM steps.
+
+Responses are keyed on a hash of the model, the system instruction, the tool
+and output schemas and the request contents, so any prompt change produces a
+new key and stale entries are simply never hit again.
+
+The cache is configured with the following environment variables:
+
+    LLM_RESPONSE_CACHE_AGENTS   comma separated allow-list of agent names (empty disables the cache)
+    LLM_RESPONSE_CACHE_SIZE     number of entries kept in the in-process LRU (default 1024),
+                                0 keeps them in the SQLite tier only
+    LLM_RESPONSE_CACHE_PATH     optional SQLite file used as a second, persistent tier
+    LLM_RESPONSE_CACHE_TTL      optional time to live of entries in seconds
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from google.adk.agents.callback_context import CallbackContext
+    from google.adk.models.llm_request import LlmRequest
+    from google.adk.models.llm_response import LlmResponse
+
+logger = logging.getLogger(__name__)
+
+
+class _DiskTier:
+    """SQLite backed storage for serialized responses.
+
+    The calls are blocking, the cache runs them in a worker thread.
+    """
+
+    # expired rows are deleted every this many writes
+    _PRUNE_EVERY = 256
+
+    def __init__(self, path: str, ttl: float | None) -> None:
+        self._ttl = ttl
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.prune()
+
+    def get(self, key: str) -> tuple[str, float] | None:
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM llm_responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, created_at = row
+        if self._ttl is not None and time.time() - created_at > self._ttl:
+            return None
+        return str(value), float(created_at)
+
+    def set(self, key: str, value: str, created_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, created_at),
+            )
+            self._conn.commit()
+            self._writes += 1
+            prune = self._writes % self._PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self) -> None:
+        if self._ttl is None:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (time.time() - self._ttl,))
+            self._conn.commit()
+
+
+class ResponseCache:
+    """In-process LRU of serialized LlmResponses with an optional SQLite tier."""
+
+    # keys of misses waiting for their model response
+    _MAX_PENDING = 1024
+
+    def __init__(
+        self,
+        agents: set[str],
+        max_entries: int = 1024,
+        disk_path: str | None = None,
+        ttl: float | None = None,
+    ) -> None:
+        self.agents = agents
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (serialized response, creation time)
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._disk = _DiskTier(disk_path, ttl) if disk_path else None
+        # keys computed in the before-model callback, waiting for the model response
+        self._pending: OrderedDict[tuple[str, str], str] = OrderedDict()
+        self._hits: dict[str, int] = {}
+        self._misses: dict[str, int] = {}
+
+    def is_enabled_for(self, agent_name: str) -> bool:
+        return agent_name in self.agents
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    async def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is not None and self._is_expired(entry[1]):
+            del self._entries[key]
+            entry = None
+
+        if entry is None and self._disk is not None:
+            entry = await asyncio.to_thread(self._disk.get, key)
+            if entry is not None:
+                self._remember(key, entry)
+
+        if entry is None:
+            return None
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        return entry[0]
+
+    async def set(self, key: str, value: str) -> None:
+        entry = (value, time.time())
+        self._remember(key, entry)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.set, key, *entry)
+
+    def _remember(self, key: str, entry: tuple[str, float]) -> None:
+        if self.max_entries < 1:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def remember_pending(self, invocation_id: str, agent_name: str, key: str) -> None:
+        """Keeps the key of a miss until the after-model callback stores the response."""
+        pending_key = (invocation_id, agent_name)
+        self._pending[pending_key] = key
+        self._pending.move_to_end(pending_key)
+        # keys of model calls that failed are never popped
+        while len(self._pending) > self._MAX_PENDING:
+            self._pending.popitem(last=False)
+
+    def pop_pending(self, invocation_id: str, agent_name: str) -> str | None:
+        return self._pending.pop((invocation_id, agent_name), None)
+
+    def record(self, agent_name: str, hit: bool) -> None:
+        counter = self._hits if hit else self._misses
+        counter[agent_name] = counter.get(agent_name, 0) + 1
+
+    def stats(self) -> dict[str, Any]:
+        per_agent: dict[str, dict[str, Any]] = {}
+        for agent_name in sorted(self.agents | self._hits.keys() | self._misses.keys()):
+            hits = self._hits.get(agent_name, 0)
+            misses = self._misses.get(agent_name, 0)
+            total = hits + misses
+            per_agent[agent_name] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / total if total else 0.0,
+            }
+        return {
+            "enabled": bool(self.agents),
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "disk_tier": self._disk is not None,
+            "agents": per_agent,
+        }
+
+
+def _jsonable(value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, type) and hasattr(value, "model_json_schema"):
+        return value.model_json_schema()
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    return value
+
+
+def make_cache_key(llm_request: LlmRequest) -> str:
+    """Hash of everything that determines the model output for a request."""
+    config = llm_request.config
+    payload = {
+        "model": llm_request.model or "",
+        "instruction": _jsonable(config.system_instruction) if config else None,
+        "tools": _jsonable(config.tools) if config else None,
+        "response_schema": _jsonable(config.response_schema) if config else None,
+        "contents": _jsonable(llm_request.contents),
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+_response_cache: ResponseCache | None = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Returns the process wide cache, building it from the environment on first use.
+
+    Opening the SQLite tier blocks, the app builds the cache in a worker thread on startup.
+    """
+    global _response_cache
+    if _response_cache is None:
+        agents = {a.strip() for a in os.getenv("LLM_RESPONSE_CACHE_AGENTS", "").split(",") if a.strip()}
+        ttl = os.getenv("LLM_RESPONSE_CACHE_TTL")
+        _response_cache = ResponseCache(
+            agents=agents,
+            max_entries=int(os.getenv("LLM_RESPONSE_CACHE_SIZE", "1024")),
+            disk_path=os.getenv("LLM_RESPONSE_CACHE_PATH") or None,
+            ttl=float(ttl) if ttl else None,
+        )
+    return _response_cache
+
+
+async def lookup_cached_response(
+    callback_context: CallbackContext,
+    llm_request: LlmRequest,
+) -> LlmResponse | None:
+    """Before-model callback serving a cached response for allow-listed agents."""
+    cache = get_response_cache()
+    agent_name = callback_context.agent_name
+    if not cache.is_enabled_for(agent_name):
+        return None
+
+    from google.adk.models.llm_response import LlmResponse
+
+    key = make_cache_key(llm_request)
+    cached = await cache.get(key)
+    cache.record(agent_name, hit=cached is not None)
+    if cached is not None:
+        logger.debug("LLM response cache hit for %s", agent_name)
+        return LlmResponse.model_validate_json(cached)
+
+    cache.remember_pending(callback_context.invocation_id, agent_name, key)
+    return None
+
+
+async def store_cached_response(
+    callback_context: CallbackContext,
+    llm_response: LlmResponse,
+) -> LlmResponse | None:
+    """After-model callback storing complete responses for allow-listed agents."""
+    cache = get_response_cache()
+    agent_name = callback_context.agent_name
+    if not cache.is_enabled_for(agent_name):
+        return None
+
+    key = cache.pop_pending(callback_context.invocation_id, agent_name)
+    if key is None or llm_response.partial or llm_response.error_code or not llm_response.content:
+        return None
+
+    await cache.set(key, llm_response.model_dump_json(exclude_none=True))
+    return None
@@ -0,0 +1,282 @@
+"""Adaptive load shedding.
+
+The controller watches the number of in-flight turns and the recent turn
+latency and steps through cheaper modes as they cross their thresholds:
+
+    NORMAL            full guardrail agents and the configured models
+    LOCAL_GUARDRAILS  guardrails are checked locally instead of with a model
+    FALLBACK_MODEL    agents use their `*_AGENT_FALLBACK_MODEL` when one is set
+    SHED              turns are rejected with a "please retry" response
+
+Escalation is immediate. A mode is left one step at a time, only after it was
+held for `OVERLOAD_MIN_DWELL_S` and once both signals are below the thresholds
+scaled by `OVERLOAD_RECOVERY_RATIO`, so the mode does not flap. The latency
+signal for escalation only uses turns started since the last mode change, the
+one for recovery the turns finished during the dwell time (or the last ones
+finished since the mode change when traffic is slow) and the turns still
+running for longer than the recovery threshold. A mode entered because of the
+latency is held while too few turns finished to tell, until no turn was seen
+for `OVERLOAD_LATENCY_WINDOW_S`. While shedding every
+`OVERLOAD_SHED_PROBE_INTERVAL`th turn is let through as a probe, so a
+recovered provider is noticed after the dwell time.
+
+    OVERLOAD_CONTROL_ENABLED        true by default
+    OVERLOAD_INFLIGHT_THRESHOLDS    in-flight turns entering each mode (default 32,64,128)
+    OVERLOAD_LATENCY_THRESHOLDS_MS  p95 turn latency entering each mode (default 8000,15000,30000)
+    OVERLOAD_RECOVERY_RATIO         default 0.7
+    OVERLOAD_MIN_DWELL_S            default 10
+    OVERLOAD_LATENCY_WINDOW_S       default 60
+    OVERLOAD_SHED_PROBE_INTERVAL    default 20
+    OVERLOAD_RETRY_AFTER_S          Retry-After of shed turns in seconds (default 5)
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import TYPE_CHECKING, Any, Callable, Iterator
+
+if TYPE_CHECKING:
+    from google.adk.agents.callback_context import CallbackContext
+    from google.adk.models.lite_llm import LiteLlm
+    from google.adk.models.llm_request import LlmRequest
+    from google.adk.models.llm_response import LlmResponse
+
+logger = logging.getLogger(__name__)
+
+_MIN_LATENCY_SAMPLES = 5
+
+
+class OverloadMode(IntEnum):
+    NORMAL = 0
+    LOCAL_GUARDRAILS = 1
+    FALLBACK_MODEL = 2
+    SHED = 3
+
+
+def _p95(latencies: list[float]) -> float:
+    if not latencies:
+        return 0.0
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+
+class OverloadController:
+    """Chooses the overload mode from in-flight turns and recent latency."""
+
+    def __init__(
+        self,
+        inflight_thresholds: list[int],
+        latency_thresholds_ms: list[float],
+        recovery_ratio: float = 0.7,
+        min_dwell_s: float = 10.0,
+        latency_window_s: float = 60.0,
+        shed_probe_interval: int = 20,
+        enabled: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.inflight_thresholds = inflight_thresholds
+        self.latency_thresholds_ms = latency_thresholds_ms
+        self.recovery_ratio = recovery_ratio
+        self.min_dwell_s = min_dwell_s
+        self.latency_window_s = latency_window_s
+        self.shed_probe_interval = max(1, shed_probe_interval)
+        self.enabled = enabled
+        self._clock = clock
+
+        self.mode = OverloadMode.NORMAL
+        self.in_flight = 0
+        self.shed_turns = 0
+        self.probe_turns = 0
+        # (finished, started, latency_ms) of the recent turns
+        self._latencies: deque[tuple[float, float, float]] = deque()
+        # start time of every turn in flight
+        self._running: dict[int, float] = {}
+        self._turn_ids = itertools.count()
+        # whether the latency, rather than the in-flight turns, set the mode
+        self._latency_driven = False
+        self._mode_since = clock()
+        self._time_in_mode: dict[OverloadMode, float] = {m: 0.0 for m in OverloadMode}
+        self._transitions: dict[str, int] = {}
+
+    def latency_p95_ms(self, now: float | None = None) -> float:
+        """p95 latency of the turns in the window started since the last mode change."""
+        now = self._clock() if now is None else now
+        while self._latencies and now - self._latencies[0][0] > self.latency_window_s:
+            self._latencies.popleft()
+        latencies = [latency for _, started, latency in self._latencies if started >= self._mode_since]
+        return _p95(latencies) if len(latencies) >= _MIN_LATENCY_SAMPLES else 0.0
+
+    def _recovery_latency_p95_ms(self, now: float) -> float | None:
+        """p95 latency recovery is judged on, None when too few turns finished to tell."""
+        latencies = [latency for finished, _, latency in self._latencies if now - finished < self.min_dwell_s]
+        if len(latencies) < _MIN_LATENCY_SAMPLES:
+            # slow traffic, use the last turns finished since the mode change
+            since_mode = [latency for finished, _, latency in self._latencies if finished >= self._mode_since]
+            latencies = since_mode[-_MIN_LATENCY_SAMPLES:]
+
+        # turns still running past the recovery threshold are at least that slow
+        thresholds = self.latency_thresholds_ms[: self.mode]
+        if thresholds:
+            threshold = thresholds[-1] * self.recovery_ratio
+            latencies += [age for age in ((now - s) * 1000 for s in self._running.values()) if age >= threshold]
+
+        return _p95(latencies) if len(latencies) >= _MIN_LATENCY_SAMPLES else None
+
+    def _level(self, ratio: float, latency: float) -> int:
+        inflight_level = sum(1 for t in self.inflight_thresholds if self.in_flight >= t * ratio)
+        latency_level = sum(1 for t in self.latency_thresholds_ms if latency >= t * ratio)
+        return min(max(inflight_level, latency_level), OverloadMode.SHED)
+
+    def _switch(self, mode: OverloadMode, now: float) -> None:
+        self._time_in_mode[self.mode] += now - self._mode_since
+        transition = f"{self.mode.name}->{mode.name}"
+        self._transitions[transition] = self._transitions.get(transition, 0) + 1
+        logger.warning(
+            "Overload mode %s (in-flight turns %s, p95 latency %.0f ms)",
+            transition,
+            self.in_flight,
+            self.latency_p95_ms(now),
+        )
+        self.mode = mode
+        self._mode_since = now
+
+    def evaluate(self) -> OverloadMode:
+        if not self.enabled:
+            return self.mode
+
+        now = self._clock()
+        latency = self.latency_p95_ms(now)
+        target = self._level(1.0, latency)
+        if target > self.mode:
+            self._latency_driven = self._level(1.0, 0.0) < target
+            self._switch(OverloadMode(target), now)
+        elif self.mode > OverloadMode.NORMAL and now - self._mode_since >= self.min_dwell_s:
+            # recover once the recent turns, e.g. shedding probes, were fast
+            recovery_latency = self._recovery_latency_p95_ms(now)
+            if recovery_latency is None:
+                # unknown, a latency driven mode is held until the traffic is gone
+                idle = not self._latencies and not self._running
+                recovery_latency = 0.0 if idle or not self._latency_driven else None
+            if recovery_latency is not None and self._level(self.recovery_ratio, recovery_latency) < self.mode:
+                self._switch(OverloadMode(self.mode - 1), now)
+        return self.mode
+
+    def should_shed(self) -> bool:
+        if self.evaluate() != OverloadMode.SHED:
+            return False
+        # let a few turns through, their latency tells when the provider recovered
+        if (self.shed_turns + self.probe_turns + 1) % self.shed_probe_interval == 0:
+            self.probe_turns += 1
+            return False
+        self.shed_turns += 1
+        return True
+
+    @contextmanager
+    def track_turn(self) -> Iterator[None]:
+        turn_id = next(self._turn_ids)
+        self.in_flight += 1
+        self.evaluate()
+        started = self._running[turn_id] = self._clock()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            del self._running[turn_id]
+            finished = self._clock()
+            self._latencies.append((finished, started, (finished - started) * 1000))
+            self.evaluate()
+
+    def snapshot(self) -> dict[str, Any]:
+        # the mode is otherwise only updated by turns, it has to recover once they stopped
+        self.evaluate()
+        now = self._clock()
+        time_in_mode = dict(self._time_in_mode)
+        time_in_mode[self.mode] += now - self._mode_since
+        return {
+            "enabled": self.enabled,
+            "mode": self.mode.name,
+            "level": int(self.mode),
+            "mode_age_s": now - self._mode_since,
+            "in_flight": self.in_flight,
+            "latency_p95_ms": self.latency_p95_ms(now),
+            "latency_samples": len(self._latencies),
+            "shed_turns": self.shed_turns,
+            "probe_turns": self.probe_turns,
+            "transitions": self._transitions,
+            "time_in_mode_s": {m.name: t for m, t in time_in_mode.items()},
+            "inflight_thresholds": self.inflight_thresholds,
+            "latency_thresholds_ms": self.latency_thresholds_ms,
+        }
+
+
+_overload_controller: OverloadController | None = None
+
+
+def get_overload_controller() -> OverloadController:
+    """Returns the process wide controller, building it from the environment on first use."""
+    global _overload_controller
+    if _overload_controller is None:
+        _overload_controller = OverloadController(
+            inflight_thresholds=[int(v) for v in os.getenv("OVERLOAD_INFLIGHT_THRESHOLDS", "32,64,128").split(",")],
+            latency_thresholds_ms=[
+                float(v) for v in os.getenv("OVERLOAD_LATENCY_THRESHOLDS_MS", "8000,15000,30000").split(",")
+            ],
+            recovery_ratio=float(os.getenv("OVERLOAD_RECOVERY_RATIO", "0.7")),
+            min_dwell_s=float(os.getenv("OVERLOAD_MIN_DWELL_S", "10")),
+            latency_window_s=float(os.getenv("OVERLOAD_LATENCY_WINDOW_S", "60")),
+            shed_probe_interval=int(os.getenv("OVERLOAD_SHED_PROBE_INTERVAL", "20")),
+            enabled=os.getenv("OVERLOAD_CONTROL_ENABLED", "true").lower() == "true",
+        )
+    return _overload_controller
+
+
+# environment variable of the primary model of every agent,
+# the fallback is read from the same name with _FALLBACK_MODEL
+_AGENT_MODEL_ENV = {
+    "triage_agent": "TRIAGE_AGENT_MODEL",
+    "seat_booking_agent": "SEAT_BOOKING_AGENT_MODEL",
+    "flight_status_agent": "FLIGHT_STATUS_AGENT_MODEL",
+    "faq_agent": "FAQ_AGENT_MODEL",
+    "cancellation_agent": "CANCEL_FLIGHT_AGENT_MODEL",
+}
+
+_fallback_llms: dict[str, LiteLlm] = {}
+
+
+def _fallback_model(agent_name: str) -> str | None:
+    env_name = _AGENT_MODEL_ENV.get(agent_name)
+    if env_name is None:
+        return None
+    return os.getenv(env_name.removesuffix("_MODEL") + "_FALLBACK_MODEL") or None
+
+
+async def use_fallback_model(
+    callback_context: CallbackContext,
+    llm_request: LlmRequest,
+) -> LlmResponse | None:
+    """Before-model callback answering with the agent's smaller fallback model under overload."""
+    if get_overload_controller().mode < OverloadMode.FALLBACK_MODEL:
+        return None
+
+    model = _fallback_model(callback_context.agent_name)
+    if model is None:
+        return None
+
+    if model not in _fallback_llms:
+        from google.adk.models.lite_llm import LiteLlm
+
+        _fallback_llms[model] = LiteLlm(model=model)
+
+    try:
+        responses = [r async for r in _fallback_llms[model].generate_content_async(llm_request, stream=False)]
+    except Exception:
+        # the primary model answers instead
+        logger.exception("Fallback model %s failed for %s", model, callback_context.agent_name)
+        return None
+    return responses[-1] if responses else None
@@ -2,14 +2,16 @@ from __future__ import annotations
 
 import random
 import string
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class ChatRequest(BaseModel):
     conversation_id: Optional[str] = None
     message: str
+    # only return changed context fields, no agent graph and no duplicated tool results
+    compact: bool = False
 
 
 class MessageResponse(BaseModel):
@@ -41,10 +43,66 @@ class ChatResponse(BaseModel):
     messages: List[MessageResponse]
     events: List[AgentEvent]
     context: Dict[str, Any]
-    agents: List[Dict[str, Any]]
+    agents: Optional[List[Dict[str, Any]]] = None
+    agents_etag: Optional[str] = None
     guardrails: List[GuardrailCheck] = []
 
 
+class ScriptedConversation(BaseModel):
+    """Messages sent in order to one conversation (a new one if conversation_id is not set)."""
+
+    conversation_id: Optional[str] = None
+    messages: List[str]
+
+
+class ChatBatchRequest(BaseModel):
+    items: List[ChatRequest] = []
+    conversations: List[ScriptedConversation] = []
+    max_concurrency: Optional[int] = Field(default=None, ge=1)
+    # compact responses for every turn, items can also set it one by one
+    compact: bool = False
+
+
+class ChatBatchResult(BaseModel):
+    type: Literal["result"] = "result"
+    index: int
+    conversation_id: Optional[str] = None
+    response: Optional[ChatResponse] = None
+    error: Optional[str] = None
+    latency_ms: float
+
+
+class ChatBatchSummary(BaseModel):
+    type: Literal["summary"] = "summary"
+    conversations: int
+    turns: int
+    succeeded: int
+    failed: int
+    concurrency: int
+    elapsed_s: float
+    turns_per_second: float
+
+
+class ChatSocketRequest(BaseModel):
+    """Frame sent by clients over the chat websocket."""
+
+    type: Literal["chat", "cancel"]
+    request_id: str
+    conversation_id: Optional[str] = None
+    message: str = ""
+    compact: bool = False
+
+
+class ChatSocketFrame(BaseModel):
+    """Frame pushed to clients over the chat websocket."""
+
+    type: Literal["event", "response", "error", "cancelled"]
+    request_id: Optional[str] = None
+    event: Optional[AgentEvent] = None
+    response: Optional[ChatResponse] = None
+    error: Optional[str] = None
+
+
 class AirlineAgentContext(BaseModel):
     """Context for airline customer service agents."""
 
@@ -0,0 +1,243 @@
+"""Startup warm-up of the LiteLlm model clients.
+
+Warm-up resolves every configured `*_AGENT_MODEL` and `*_AGENT_FALLBACK_MODEL`,
+installs a shared pooled keep-alive HTTP client for litellm and opens a
+connection to every distinct endpoint, so the first request after a deploy
+does not pay for lazy imports and TLS handshakes.
+
+    WARMUP_PRIME_MODELS         send a tiny completion to every model (default false)
+    WARMUP_TIMEOUT_S            timeout of every warm-up call (default 10)
+    HTTP_POOL_MAX_CONNECTIONS   maximum connections of the shared pool (default 1000)
+    HTTP_POOL_KEEPALIVE_EXPIRY  seconds an idle connection is kept open (default 60)
+    HTTP_POOL_MAX_KEEPALIVE     maximum idle keep-alive connections (default 100), only
+                                with the httpx transport (`DISABLE_AIOHTTP_TRANSPORT=true`),
+                                the default aiohttp transport keeps every idle connection
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupState:
+    """Progress of the warm-up phase, reported by the readiness endpoint."""
+
+    def __init__(self) -> None:
+        self.ready = False
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.models: dict[str, str] = {}
+        # pre-connected endpoint -> "connected" or the error
+        self.endpoints: dict[str, str] = {}
+        # models whose endpoint could not be resolved
+        self.unresolved: list[str] = []
+        self.errors: dict[str, str] = {}
+
+    def as_dict(self) -> dict[str, Any]:
+        duration = (
+            self.finished_at - self.started_at if self.started_at is not None and self.finished_at is not None else None
+        )
+        return {
+            "ready": self.ready,
+            "duration_s": duration,
+            "models": self.models,
+            "endpoints": self.endpoints,
+            "unresolved": self.unresolved,
+            "errors": self.errors,
+        }
+
+
+warmup_state = WarmupState()
+
+_http_client: httpx.AsyncClient | None = None
+
+
+def configured_models() -> dict[str, str]:
+    """Maps every `*_AGENT_MODEL` and `*_AGENT_FALLBACK_MODEL` environment variable to its model name."""
+    return {
+        k: v
+        for k, v in sorted(os.environ.items())
+        if (k.endswith("_AGENT_MODEL") or k.endswith("_AGENT_FALLBACK_MODEL")) and v
+    }
+
+
+def _pool_transport(ssl_config: Any) -> httpx.AsyncBaseTransport:
+    """Transport of the shared pool, the one litellm would pick, sized from the environment."""
+    import ssl
+
+    import httpx
+    import litellm
+    from litellm.llms.custom_httpx.http_handler import AsyncHTTPHandler
+
+    max_connections = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "1000"))
+    keepalive_expiry = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY", "60"))
+
+    # httpx ignores the client limits once a transport is given, the pool is sized here
+    if not AsyncHTTPHandler._should_use_aiohttp_transport():
+        return httpx.AsyncHTTPTransport(
+            verify=ssl_config,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "100")),
+                keepalive_expiry=keepalive_expiry,
+            ),
+            local_address="0.0.0.0" if litellm.force_ipv4 else None,
+        )
+
+    from aiohttp import ClientSession, TCPConnector
+    from litellm.llms.custom_httpx.aiohttp_transport import LiteLLMAiohttpTransport
+
+    connector_kwargs = AsyncHTTPHandler._get_ssl_connector_kwargs(
+        ssl_verify=ssl_config if isinstance(ssl_config, bool) else None,
+        ssl_context=ssl_config if isinstance(ssl_config, ssl.SSLContext) else None,
+    )
+    trust_env = litellm.aiohttp_trust_env or os.getenv("AIOHTTP_TRUST_ENV", "false").lower() == "true"
+    return LiteLLMAiohttpTransport(
+        client=lambda: ClientSession(
+            connector=TCPConnector(limit=max_connections, keepalive_timeout=keepalive_expiry, **connector_kwargs),
+            trust_env=trust_env,
+        ),
+    )
+
+
+def configure_http_pool() -> httpx.AsyncClient:
+    """Installs one pooled HTTP client shared by every litellm call.
+
+    The pool keeps connections alive per origin, so agents that target the same
+    endpoint reuse the same connections. The client is set up like the one
+    litellm builds itself (SSL configuration, transport, redirects).
+    """
+    global _http_client
+    if _http_client is None:
+        import httpx
+        import litellm
+        from litellm.llms.custom_httpx.http_handler import get_ssl_configuration
+
+        ssl_config = get_ssl_configuration()
+        _http_client = httpx.AsyncClient(
+            verify=ssl_config,
+            transport=_pool_transport(ssl_config),
+            follow_redirects=True,
+            timeout=httpx.Timeout(600.0, connect=10.0),
+        )
+        litellm.aclient_session = _http_client
+    return _http_client
+
+
+async def close_http_pool() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+# default endpoints of providers litellm does not report one for
+_DEFAULT_API_BASES = {
+    "anthropic": "https://api.anthropic.com",
+}
+
+
+def _resolve_api_base(model: str) -> str | None:
+    """Origin the model is served from, None when it cannot be told (e.g. azure without AZURE_API_BASE)."""
+    import httpx
+    from litellm.litellm_core_utils.get_llm_provider_logic import get_llm_provider
+    from litellm.litellm_core_utils.llm_response_utils.get_api_base import get_api_base
+
+    _, provider, _, api_base = get_llm_provider(model=model)
+    api_base = api_base or os.getenv(f"{provider.upper()}_API_BASE")
+    if not api_base:
+        try:
+            api_base = get_api_base(model, {})
+        except Exception:
+            api_base = None
+    api_base = api_base or _DEFAULT_API_BASES.get(provider)
+    if not api_base:
+        return None
+    # connections are pooled per origin
+    url = httpx.URL(api_base)
+    return f"{url.scheme}://{url.netloc.decode()}"
+
+
+def _warmup_timeout() -> float:
+    return float(os.getenv("WARMUP_TIMEOUT_S", "10"))
+
+
+async def _open_connection(client: httpx.AsyncClient, api_base: str) -> None:
+    # any response will do, we only want the TLS session in the pool
+    await client.head(api_base, timeout=_warmup_timeout())
+
+
+async def _prime_model(model: str) -> None:
+    import litellm
+
+    await asyncio.wait_for(
+        litellm.acompletion(
+            model=model,
+            messages=[{"role": "user", "content": "ping"}],
+            max_tokens=1,
+            timeout=_warmup_timeout(),
+        ),
+        timeout=_warmup_timeout(),
+    )
+
+
+async def warm_up() -> None:
+    """Runs the warm-up phase and marks the service ready once it is done."""
+    warmup_state.started_at = time.monotonic()
+
+    # building the agents imports litellm and the ADK model classes
+    from .agents import agents_info
+
+    agents_info()
+
+    client = configure_http_pool()
+
+    endpoints: set[str] = set()
+    for env_name, model in configured_models().items():
+        try:
+            api_base = _resolve_api_base(model)
+        except Exception as e:
+            warmup_state.errors[env_name] = str(e)
+            continue
+        warmup_state.models[env_name] = model
+        if api_base:
+            endpoints.add(api_base)
+        else:
+            logger.warning("Could not resolve the endpoint of %s (%s), it is not pre-connected", env_name, model)
+            warmup_state.unresolved.append(env_name)
+
+    results = await asyncio.gather(
+        *(_open_connection(client, api_base) for api_base in endpoints),
+        return_exceptions=True,
+    )
+    for api_base, result in zip(endpoints, results, strict=True):
+        if isinstance(result, Exception):
+            logger.warning("Could not pre-connect to %s: %s", api_base, result)
+            warmup_state.endpoints[api_base] = str(result) or type(result).__name__
+        else:
+            warmup_state.endpoints[api_base] = "connected"
+
+    if os.getenv("WARMUP_PRIME_MODELS", "false").lower() == "true":
+        models = sorted(set(warmup_state.models.values()))
+        results = await asyncio.gather(*(_prime_model(m) for m in models), return_exceptions=True)
+        for model, result in zip(models, results, strict=True):
+            if isinstance(result, Exception):
+                warmup_state.errors[model] = str(result) or type(result).__name__
+
+    warmup_state.finished_at = time.monotonic()
+    warmup_state.ready = True
+    logger.info(
+        "Warm-up finished in %.2fs (%s models, %s endpoints)",
+        warmup_state.finished_at - warmup_state.started_at,
+        len(warmup_state.models),
+        len(endpoints),
+    )
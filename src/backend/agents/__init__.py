@@ -1,7 +1,20 @@
-from .triage import agents_info
-from .triage import triage_agent as root_agent
+from typing import Any
 
 __all__ = [
     "root_agent",
     "agents_info",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    # Building the agents imports litellm and the ADK model classes,
+    # so they are only imported when first accessed.
+    if name == "root_agent":
+        from .triage import triage_agent
+
+        return triage_agent
+    if name == "agents_info":
+        from .triage import agents_info
+
+        return agents_info
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -5,6 +5,8 @@ from google.adk.agents.callback_context import CallbackContext
 from google.adk.agents.readonly_context import ReadonlyContext
 from google.adk.models.lite_llm import LiteLlm
 
+from backend._cache import lookup_cached_response, store_cached_response
+from backend._overload import use_fallback_model
 from backend._tools import cancel_flight
 from backend._types import AirlineAgentContext
 
@@ -38,5 +40,11 @@ cancel_flight_agent = LlmAgent(
     instruction=_instruction_provider,
     tools=[cancel_flight],
     before_agent_callback=_ensure_context,
-    before_model_callback=[run_relevance_guardrail_agent, run_jailbreak_guardrail_agent],
+    before_model_callback=[
+        run_relevance_guardrail_agent,
+        run_jailbreak_guardrail_agent,
+        lookup_cached_response,
+        use_fallback_model,
+    ],
+    after_model_callback=store_cached_response,
 )
@@ -1,3 +1,4 @@
+import functools
 import os
 from typing import Any
 
@@ -6,6 +7,8 @@ from google.adk.agents.callback_context import CallbackContext
 from google.adk.agents.readonly_context import ReadonlyContext
 from google.adk.models.lite_llm import LiteLlm
 
+from backend._cache import lookup_cached_response, store_cached_response
+from backend._overload import use_fallback_model
 from backend._types import AirlineAgentContext
 
 from .cancel_flight import cancel_flight_agent
@@ -50,10 +53,14 @@ triage_agent = LlmAgent(
     before_model_callback=[
         run_relevance_guardrail_agent,
         run_jailbreak_guardrail_agent,
+        lookup_cached_response,
+        use_fallback_model,
     ],
+    after_model_callback=store_cached_response,
 )
 
 
+@functools.cache
 def agents_info() -> list[dict[str, Any]]:
     def make_agent_dict(agent: LlmAgent) -> dict[str, Any]:
         return {
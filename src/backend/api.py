@@ -1,20 +1,44 @@
+from __future__ import annotations
+
 import asyncio
+import contextlib
+import functools
+import hashlib
+import json
 import logging
 import os
+import time
 from contextlib import asynccontextmanager
-from typing import Any, AsyncGenerator
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Awaitable, Callable
 from uuid import uuid4
 
-from adk_dynamodb_session import DynamoDBSessionService
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.genai import types as genai_types
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ._cache import get_response_cache
+from ._overload import get_overload_controller
+from ._types import (
+    AgentEvent,
+    AirlineAgentContext,
+    ChatBatchRequest,
+    ChatBatchResult,
+    ChatBatchSummary,
+    ChatRequest,
+    ChatResponse,
+    ChatSocketFrame,
+    ChatSocketRequest,
+    GuardrailCheck,
+    MessageResponse,
+)
+from ._warmup import close_http_pool, warm_up, warmup_state
 
-from ._types import AgentEvent, AirlineAgentContext, ChatRequest, ChatResponse, GuardrailCheck, MessageResponse
-from .agents import agents_info, root_agent
+if TYPE_CHECKING:
+    from google.adk.runners import Runner
+    from google.adk.sessions import BaseSessionService
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,13 +48,31 @@ ADK_USER_ID = "cs-agents-demo-user"
 
 load_dotenv()
 
-if os.getenv("USE_LOCAL_DYNAMO_DB", "false").lower() == "true":
-    session_service = DynamoDBSessionService()  # type: ignore
-    session_service.create_table_if_not_exists()
-else:
-    # Use in-memory session service for local development or testing
-    # This is not suitable for production use as it does not persist data
-    session_service = InMemorySessionService()  # type: ignore
+# The ADK, litellm, the agents and the session backend are heavy to import.
+# They are imported on first use (or by the warm-up in the lifespan) so that
+# importing this module, and hence reloading the dev server, stays fast.
+_session_service: BaseSessionService | None = None
+
+
+def _get_session_service() -> BaseSessionService:
+    """Returns the session service selected by the configuration."""
+    global _session_service
+    if _session_service is not None:
+        return _session_service
+
+    if os.getenv("USE_LOCAL_DYNAMO_DB", "false").lower() == "true":
+        from adk_dynamodb_session import DynamoDBSessionService
+
+        dynamodb_session_service = DynamoDBSessionService()  # type: ignore
+        dynamodb_session_service.create_table_if_not_exists()
+        _session_service = dynamodb_session_service
+    else:
+        from google.adk.sessions import InMemorySessionService
+
+        # Use in-memory session service for local development or testing
+        # This is not suitable for production use as it does not persist data
+        _session_service = InMemorySessionService()  # type: ignore
+    return _session_service
 
 
 runner_dict: dict[str, Runner] = {}  # type: ignore
@@ -40,10 +82,15 @@ async def _get_runner_async(app_name: str) -> Runner:
     """Returns the runner for the given app."""
     if app_name in runner_dict:
         return runner_dict[app_name]
+
+    from google.adk.runners import Runner
+
+    from .agents import root_agent
+
     runner = Runner(
         app_name=app_name,
         agent=root_agent,
-        session_service=session_service,
+        session_service=_get_session_service(),
     )
     runner_dict[app_name] = runner
     return runner
@@ -66,19 +113,82 @@ async def _close_runners(runners: list[Runner]) -> None:
                 task.cancel()
 
 
+@functools.cache
+def _agents_document() -> tuple[bytes, str]:
+    """The serialized agent graph and its ETag, built once per process."""
+    from .agents import agents_info
+
+    body = json.dumps(agents_info(), separators=(",", ":")).encode("utf-8")
+    # weak, the same validator covers the identity and the gzip encoded body
+    return body, f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def _context_delta(previous: dict[str, Any], current: dict[str, Any]) -> dict[str, Any]:
+    return {k: v for k, v in current.items() if k not in previous or previous[k] != v}
+
+
+def _import_agents() -> None:
+    import google.adk.runners  # noqa: F401
+
+    from .agents import root_agent  # noqa: F401
+
+
+async def _warm_up_app() -> None:
+    # importing the ADK, litellm and the agents blocks for seconds,
+    # it runs in a worker thread so that probes are answered meanwhile
+    await asyncio.to_thread(_import_agents)
+    await asyncio.to_thread(_agents_document)
+    await _get_runner_async(app_name=ADK_APP_NAME)
+    await warm_up()
+
+
+def _log_warmup_failure(task: asyncio.Task[None]) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Warm-up failed", exc_info=task.exception())
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    # the session backend and the response cache are set up before serving, in a
+    # worker thread since creating the DynamoDB table and opening the SQLite tier block
+    await asyncio.to_thread(_get_session_service)
+    await asyncio.to_thread(get_response_cache)
+
+    # warm-up runs in the background, /health/ready reports
+    # when it is done so that traffic is only routed afterwards
+    warmup_task = asyncio.create_task(_warm_up_app())
+    warmup_task.add_done_callback(_log_warmup_failure)
     try:
         yield
     finally:
+        warmup_task.cancel()
         # Create tasks for all runner closures to run concurrently
         await _close_runners(list(runner_dict.values()))
+        await close_http_pool()
+
+
+class _PathGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware applied only to the given paths."""
+
+    def __init__(self, app: ASGIApp, paths: set[str], minimum_size: int = 500, compresslevel: int = 9) -> None:
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.paths = paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
 
 
 app = FastAPI(
     lifespan=lifespan,
 )
 
+# Compress responses for clients that accept it. Streaming responses
+# (/chat/batch) are left alone, gzip would buffer them until the end.
+app.add_middleware(_PathGZipMiddleware, paths={"/chat", "/agents"}, minimum_size=1024)
+
 # CORS configuration (adjust as needed for deployment)
 app.add_middleware(
     CORSMiddleware,
@@ -89,11 +199,37 @@ app.add_middleware(
 )
 
 
-# There is only 1 endpoint that the frontend will call.
-# Depending on the ChatRequest, we will construct an
-# appropriate response and return it.
-@app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(req: ChatRequest) -> ChatResponse:
+async def _run_chat_turn(
+    req: ChatRequest,
+    on_event: Callable[[AgentEvent], Awaitable[None]] | None = None,
+) -> ChatResponse:
+    """Runs one conversation turn, unless the service is shedding load.
+
+    `on_event` is awaited with every agent event as soon as it is produced.
+    """
+    overload_controller = get_overload_controller()
+    if overload_controller.should_shed():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="We are experiencing high demand, please retry shortly.",
+            headers={"Retry-After": os.getenv("OVERLOAD_RETRY_AFTER_S", "5")},
+        )
+
+    with overload_controller.track_turn():
+        return await _run_agents_turn(req, on_event)
+
+
+async def _run_agents_turn(
+    req: ChatRequest,
+    on_event: Callable[[AgentEvent], Awaitable[None]] | None = None,
+) -> ChatResponse:
+    """Runs one conversation turn and builds the response for it."""
+    from google.genai import types as genai_types
+
+    from .agents import agents_info
+
+    session_service = _get_session_service()
+
     # if conversation_id is not provided or it does not
     # match an existing session, create a new session
 
@@ -128,7 +264,8 @@ async def chat_endpoint(req: ChatRequest) -> ChatResponse:
                 messages=[],
                 events=[],
                 context=ctx.model_dump(),
-                agents=agents_info(),
+                agents=None if req.compact else agents_info(),
+                agents_etag=_agents_document()[1] if req.compact else None,
                 guardrails=[],
             )
     else:
@@ -141,6 +278,9 @@ async def chat_endpoint(req: ChatRequest) -> ChatResponse:
 
     assert session is not None, "Session should not be None if conversation_id is provided"
 
+    # compact responses only carry the context fields changed by this turn
+    previous_context: dict[str, Any] = {} if is_new else session.state.get("context", {})
+
     new_message = req.message.strip()
     content = genai_types.Content(
         role="user",
@@ -153,6 +293,11 @@ async def chat_endpoint(req: ChatRequest) -> ChatResponse:
     events: list[AgentEvent] = []
     guardrails: list[GuardrailCheck] = []
 
+    async def _add_event(agent_event: AgentEvent) -> None:
+        events.append(agent_event)
+        if on_event is not None:
+            await on_event(agent_event)
+
     async for event in runner.run_async(
         user_id=ADK_USER_ID,
         session_id=session.id,
@@ -162,14 +307,14 @@ async def chat_endpoint(req: ChatRequest) -> ChatResponse:
             author = event.author
             text = event.content.parts[0].text
             messages.append(MessageResponse(content=text, agent=author))
-            events.append(AgentEvent(id=uuid4().hex, type="message", agent=author, content=text))
+            await _add_event(AgentEvent(id=uuid4().hex, type="message", agent=author, content=text))
 
             if event.custom_metadata and "guard_rail_triggered" in event.custom_metadata:
                 guardrails.append(event.custom_metadata["guard_rail_triggered"])
 
         if fn_calls := event.get_function_calls():
             for fn_call in fn_calls:
-                events.append(
+                await _add_event(
                     AgentEvent(
                         id=uuid4().hex,
                         type="tool_call",
@@ -189,22 +334,21 @@ async def chat_endpoint(req: ChatRequest) -> ChatResponse:
 
         if fn_responses := event.get_function_responses():
             for fn_response in fn_responses:
-                events.append(
+                await _add_event(
                     AgentEvent(
                         id=uuid4().hex,
                         type="tool_output",
                         agent=event.author,
                         content=str(fn_response.response),
-                        metadata={"tool_result": fn_response.response},
+                        metadata=None if req.compact else {"tool_result": fn_response.response},
                     )
                 )
 
     # we need to refresh the session to get the latest state
-    assert req.conversation_id is not None, "Conversation ID should not be None if session exists"
     session = await session_service.get_session(
         app_name=ADK_APP_NAME,
         user_id=ADK_USER_ID,
-        session_id=req.conversation_id,
+        session_id=session.id,
     )
 
     assert session is not None, "Session should not be None after running the agent"
@@ -216,7 +360,304 @@ async def chat_endpoint(req: ChatRequest) -> ChatResponse:
         current_agent=current_agent_name,
         messages=messages,
         events=events,
-        context=airline_context,
-        agents=agents_info(),
+        context=_context_delta(previous_context, airline_context) if req.compact else airline_context,
+        agents=None if req.compact else agents_info(),
+        agents_etag=_agents_document()[1] if req.compact else None,
         guardrails=guardrails,
     )
+
+
+# The endpoint the frontend calls for every turn.
+# Depending on the ChatRequest, we will construct an
+# appropriate response and return it.
+@app.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(req: ChatRequest) -> Response:
+    response = await _run_chat_turn(req)
+    # serialize with pydantic-core directly instead of jsonable_encoder + json.dumps
+    return Response(
+        content=response.model_dump_json(exclude_none=req.compact),
+        media_type="application/json",
+    )
+
+
+# The agent graph is static, compact /chat responses only carry its
+# ETag and clients fetch (and revalidate) it from here.
+@app.get("/agents")
+async def agents_endpoint(request: Request) -> Response:
+    body, etag = _agents_document()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    # If-None-Match uses the weak comparison, W/ is ignored on both sides
+    tags = {tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")}
+    if "*" in tags or etag.removeprefix("W/") in tags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _run_batch_conversation(
+    turns: list[tuple[int, str, bool]],
+    conversation_id: str | None,
+    semaphore: asyncio.Semaphore,
+    results: asyncio.Queue[ChatBatchResult],
+) -> None:
+    """Runs the turns of one conversation in order, each under the batch semaphore."""
+    failed = False
+    for index, message, compact in turns:
+        if failed:
+            await results.put(
+                ChatBatchResult(
+                    index=index,
+                    conversation_id=conversation_id,
+                    error="skipped after an earlier turn of the conversation failed",
+                    latency_ms=0.0,
+                )
+            )
+            continue
+
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await _run_chat_turn(
+                    ChatRequest(conversation_id=conversation_id, message=message, compact=compact)
+                )
+            except Exception as e:
+                logger.exception("Batch turn %s failed", index)
+                failed = True
+                await results.put(
+                    ChatBatchResult(
+                        index=index,
+                        conversation_id=conversation_id,
+                        error=str(e) or type(e).__name__,
+                        latency_ms=(time.perf_counter() - started) * 1000,
+                    )
+                )
+                continue
+            latency_ms = (time.perf_counter() - started) * 1000
+
+        conversation_id = response.conversation_id
+        await results.put(
+            ChatBatchResult(
+                index=index,
+                conversation_id=conversation_id,
+                response=response,
+                latency_ms=latency_ms,
+            )
+        )
+
+
+def _batch_conversations(req: ChatBatchRequest) -> list[tuple[str | None, list[tuple[int, str, bool]]]]:
+    """Groups the batch into conversations of (index, message, compact) turns.
+
+    Items and scripted conversations sharing a conversation_id form one
+    conversation, in the order they were given (items first). Items and scripts
+    without one start a new conversation each. Indices count the items first
+    and then the messages of the scripted conversations.
+    """
+    conversations: list[tuple[str | None, list[tuple[int, str, bool]]]] = []
+    by_id: dict[str, list[tuple[int, str, bool]]] = {}
+
+    def _add(conversation_id: str | None, turns: list[tuple[int, str, bool]]) -> None:
+        if conversation_id is None:
+            conversations.append((None, turns))
+        elif conversation_id in by_id:
+            by_id[conversation_id].extend(turns)
+        else:
+            by_id[conversation_id] = turns
+            conversations.append((conversation_id, turns))
+
+    index = 0
+    for item in req.items:
+        _add(item.conversation_id, [(index, item.message, item.compact or req.compact)])
+        index += 1
+
+    for script in req.conversations:
+        turns = []
+        for message in script.messages:
+            turns.append((index, message, req.compact))
+            index += 1
+        _add(script.conversation_id, turns)
+    return conversations
+
+
+# Offline evaluation and replay. Results are streamed back as
+# newline delimited JSON in completion order, followed by a summary.
+@app.post("/chat/batch")
+async def chat_batch_endpoint(req: ChatBatchRequest) -> StreamingResponse:
+    conversations = _batch_conversations(req)
+    total_turns = sum(len(turns) for _, turns in conversations)
+
+    max_concurrency = int(os.getenv("CHAT_BATCH_MAX_CONCURRENCY", "8"))
+    concurrency = max(1, min(req.max_concurrency or max_concurrency, max_concurrency))
+
+    async def _stream() -> AsyncGenerator[str, None]:
+        # make sure the runner exists before the conversations race to create it
+        await _get_runner_async(app_name=ADK_APP_NAME)
+
+        semaphore = asyncio.Semaphore(concurrency)
+        # bounded, a slow reader blocks the conversations instead of buffering their results
+        results: asyncio.Queue[ChatBatchResult] = asyncio.Queue(maxsize=concurrency)
+        started = time.perf_counter()
+        tasks = [
+            asyncio.create_task(_run_batch_conversation(turns, conversation_id, semaphore, results))
+            for conversation_id, turns in conversations
+        ]
+
+        succeeded = 0
+        try:
+            for _ in range(total_turns):
+                result = await results.get()
+                if result.error is None:
+                    succeeded += 1
+                yield result.model_dump_json(exclude_none=req.compact) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        elapsed_s = time.perf_counter() - started
+        summary = ChatBatchSummary(
+            conversations=len(conversations),
+            turns=total_turns,
+            succeeded=succeeded,
+            failed=total_turns - succeeded,
+            concurrency=concurrency,
+            elapsed_s=elapsed_s,
+            turns_per_second=succeeded / elapsed_s if elapsed_s > 0 else 0.0,
+        )
+        yield summary.model_dump_json() + "\n"
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
+
+async def _send_socket_frames(websocket: WebSocket, outbox: asyncio.Queue[ChatSocketFrame]) -> None:
+    while True:
+        frame = await outbox.get()
+        await websocket.send_text(frame.model_dump_json(exclude_none=True))
+
+
+async def _run_socket_turn(
+    req: ChatSocketRequest,
+    outbox: asyncio.Queue[ChatSocketFrame],
+    conversation_lock: asyncio.Lock | None,
+    closing: asyncio.Event,
+) -> None:
+    """Runs one turn received over a websocket and pushes its frames to the outbox.
+
+    The outbox is bounded, so a client that does not keep up with the frames
+    pauses its own turns instead of buffering them in the server.
+    """
+
+    async def _push_event(event: AgentEvent) -> None:
+        await outbox.put(ChatSocketFrame(type="event", request_id=req.request_id, event=event))
+
+    chat_req = ChatRequest(conversation_id=req.conversation_id, message=req.message, compact=req.compact)
+    try:
+        if conversation_lock is None:
+            response = await _run_chat_turn(chat_req, on_event=_push_event)
+        else:
+            # turns of the same conversation run in the order they were received
+            async with conversation_lock:
+                response = await _run_chat_turn(chat_req, on_event=_push_event)
+    except asyncio.CancelledError:
+        cancelled = ChatSocketFrame(type="cancelled", request_id=req.request_id)
+        if closing.is_set():
+            # the writer is gone, nobody reads a full outbox anymore
+            with contextlib.suppress(asyncio.QueueFull):
+                outbox.put_nowait(cancelled)
+        else:
+            # cancelled by the client, which waits for the terminal frame
+            await outbox.put(cancelled)
+        raise
+    except Exception as e:
+        logger.exception("Websocket turn %s failed", req.request_id)
+        await outbox.put(ChatSocketFrame(type="error", request_id=req.request_id, error=str(e) or type(e).__name__))
+    else:
+        await outbox.put(ChatSocketFrame(type="response", request_id=req.request_id, response=response))
+
+
+# One connection per client carrying many conversations. Clients send
+# {"type": "chat", "request_id", "conversation_id", "message"} and
+# {"type": "cancel", "request_id"} frames and receive "event" frames
+# as the agents run, followed by a "response", "error" or "cancelled" frame.
+@app.websocket("/ws")
+async def chat_socket_endpoint(websocket: WebSocket) -> None:
+    await websocket.accept()
+
+    outbox: asyncio.Queue[ChatSocketFrame] = asyncio.Queue(maxsize=int(os.getenv("WS_SEND_QUEUE_SIZE", "256")))
+    max_inflight = int(os.getenv("WS_MAX_INFLIGHT_TURNS", "32"))
+    turns: dict[str, asyncio.Task[None]] = {}
+    # the lock of every conversation with turns in flight and the number of those turns
+    conversation_locks: dict[str, asyncio.Lock] = {}
+    conversation_turns: dict[str, int] = {}
+    closing = asyncio.Event()
+
+    def _forget_turn(request_id: str, conversation_id: str | None, _: asyncio.Task[None]) -> None:
+        turns.pop(request_id, None)
+        if conversation_id is not None:
+            conversation_turns[conversation_id] -= 1
+            if not conversation_turns[conversation_id]:
+                del conversation_turns[conversation_id]
+                del conversation_locks[conversation_id]
+
+    writer = asyncio.create_task(_send_socket_frames(websocket, outbox))
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+            data = message.get("text")
+            if data is None:
+                await outbox.put(ChatSocketFrame(type="error", error="only text frames are supported"))
+                continue
+            try:
+                req = ChatSocketRequest.model_validate_json(data)
+            except ValueError as e:
+                await outbox.put(ChatSocketFrame(type="error", error=str(e)))
+                continue
+
+            if req.type == "cancel":
+                if (turn := turns.get(req.request_id)) is not None:
+                    turn.cancel()
+                continue
+
+            if req.request_id in turns:
+                await outbox.put(ChatSocketFrame(type="error", request_id=req.request_id, error="duplicate request_id"))
+                continue
+            if len(turns) >= max_inflight:
+                await outbox.put(
+                    ChatSocketFrame(type="error", request_id=req.request_id, error="too many in-flight turns")
+                )
+                continue
+
+            lock = None
+            if req.conversation_id is not None:
+                lock = conversation_locks.setdefault(req.conversation_id, asyncio.Lock())
+                conversation_turns[req.conversation_id] = conversation_turns.get(req.conversation_id, 0) + 1
+            turn = asyncio.create_task(_run_socket_turn(req, outbox, lock, closing))
+            turns[req.request_id] = turn
+            turn.add_done_callback(functools.partial(_forget_turn, req.request_id, req.conversation_id))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        closing.set()
+        for turn in list(turns.values()):
+            turn.cancel()
+        writer.cancel()
+
+
+@app.get("/health/ready")
+async def readiness_endpoint(response: Response) -> dict[str, Any]:
+    """Reports healthy only once the warm-up phase has finished."""
+    if not warmup_state.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return warmup_state.as_dict()
+
+
+@app.get("/metrics/cache")
+async def cache_metrics_endpoint() -> dict[str, Any]:
+    """Per-agent hit rates of the LLM response cache."""
+    return get_response_cache().stats()
+
+
+@app.get("/metrics/overload")
+async def overload_metrics_endpoint() -> dict[str, Any]:
+    """Current overload mode, its signals and the mode transitions so far."""
+    return get_overload_controller().snapshot()
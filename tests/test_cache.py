@@ -0,0 +1,119 @@
+from pathlib import Path
+
+import pytest
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+from backend import _cache
+from backend._cache import ResponseCache, _DiskTier, make_cache_key
+
+
+class FakeTime:
+    def __init__(self) -> None:
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def fake_time(monkeypatch: pytest.MonkeyPatch) -> FakeTime:
+    fake = FakeTime()
+    monkeypatch.setattr(_cache.time, "time", fake)
+    return fake
+
+
+def _request(message: str = "Where is my gate?", instruction: str = "You are a helpful airline agent.") -> LlmRequest:
+    return LlmRequest(
+        model="openai/gpt-4o-mini",
+        contents=[types.Content(role="user", parts=[types.Part.from_text(text=message)])],
+        config=types.GenerateContentConfig(system_instruction=instruction),
+    )
+
+
+def test_cache_key_is_stable() -> None:
+    assert make_cache_key(_request()) == make_cache_key(_request())
+
+
+def test_cache_key_changes_with_the_prompt() -> None:
+    key = make_cache_key(_request())
+
+    assert make_cache_key(_request(instruction="You are a terse airline agent.")) != key
+    assert make_cache_key(_request(message="When do we board?")) != key
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_entry_is_evicted() -> None:
+    cache = ResponseCache(agents={"faq_agent"}, max_entries=2)
+    await cache.set("a", "A")
+    await cache.set("b", "B")
+    assert await cache.get("a") == "A"
+
+    await cache.set("c", "C")
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == "A"
+    assert await cache.get("c") == "C"
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_in_memory(fake_time: FakeTime) -> None:
+    cache = ResponseCache(agents={"faq_agent"}, ttl=60)
+    await cache.set("a", "A")
+
+    fake_time.now += 59
+    assert await cache.get("a") == "A"
+    fake_time.now += 2
+    assert await cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_round_trip(tmp_path: Path) -> None:
+    path = str(tmp_path / "responses.sqlite")
+    await ResponseCache(agents={"faq_agent"}, disk_path=path).set("a", "A")
+
+    # a new process only has the disk tier
+    cache = ResponseCache(agents={"faq_agent"}, disk_path=path)
+
+    assert await cache.get("a") == "A"
+    assert cache.stats()["entries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_disk_only_cache(tmp_path: Path) -> None:
+    cache = ResponseCache(agents={"faq_agent"}, max_entries=0, disk_path=str(tmp_path / "responses.sqlite"))
+    await cache.set("a", "A")
+
+    assert await cache.get("a") == "A"
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_on_disk(tmp_path: Path, fake_time: FakeTime) -> None:
+    path = str(tmp_path / "responses.sqlite")
+    await ResponseCache(agents={"faq_agent"}, disk_path=path, ttl=60).set("a", "A")
+
+    fake_time.now += 61
+    assert await ResponseCache(agents={"faq_agent"}, disk_path=path, ttl=60).get("a") is None
+
+
+def test_expired_rows_are_pruned(tmp_path: Path, fake_time: FakeTime) -> None:
+    path = str(tmp_path / "responses.sqlite")
+    disk = _DiskTier(path, ttl=60)
+    disk.set("old", "A", fake_time.now - 120)
+    disk.set("new", "B", fake_time.now)
+
+    disk.prune()
+
+    rows = disk._conn.execute("SELECT key FROM llm_responses").fetchall()
+    assert rows == [("new",)]
+
+
+def test_pending_keys_are_popped_once() -> None:
+    cache = ResponseCache(agents={"faq_agent"})
+    cache.remember_pending("invocation", "faq_agent", "a")
+
+    assert cache.pop_pending("invocation", "triage_agent") is None
+    assert cache.pop_pending("invocation", "faq_agent") == "a"
+    assert cache.pop_pending("invocation", "faq_agent") is None
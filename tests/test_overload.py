@@ -0,0 +1,213 @@
+from typing import Any
+
+from backend._overload import OverloadController, OverloadMode
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def _controller(clock: FakeClock, latency_thresholds_ms: list[float] | None = None) -> OverloadController:
+    return OverloadController(
+        inflight_thresholds=[2, 4, 6],
+        latency_thresholds_ms=latency_thresholds_ms or [1000, 2000, 3000],
+        recovery_ratio=0.5,
+        min_dwell_s=10,
+        latency_window_s=60,
+        shed_probe_interval=4,
+        clock=clock,
+    )
+
+
+def _run_turns(controller: OverloadController, clock: FakeClock, count: int, latency_s: float) -> None:
+    for _ in range(count):
+        with controller.track_turn():
+            clock.advance(latency_s)
+
+
+def test_in_flight_turns_escalate_immediately() -> None:
+    clock = FakeClock()
+    controller = _controller(clock)
+
+    turns = [controller.track_turn() for _ in range(6)]
+    modes = []
+    for turn in turns:
+        turn.__enter__()
+        modes.append(controller.mode)
+
+    assert modes[1] == OverloadMode.LOCAL_GUARDRAILS
+    assert modes[3] == OverloadMode.FALLBACK_MODEL
+    assert modes[5] == OverloadMode.SHED
+
+
+def test_latency_escalates() -> None:
+    clock = FakeClock()
+    controller = _controller(clock)
+
+    _run_turns(controller, clock, 5, latency_s=2.5)
+
+    assert controller.mode == OverloadMode.FALLBACK_MODEL
+
+
+def test_mode_is_held_for_the_dwell_time() -> None:
+    clock = FakeClock()
+    controller = _controller(clock)
+    turns = [controller.track_turn() for _ in range(2)]
+    for turn in turns:
+        turn.__enter__()
+    assert controller.mode == OverloadMode.LOCAL_GUARDRAILS
+
+    for turn in turns:
+        turn.__exit__(None, None, None)
+    assert controller.evaluate() == OverloadMode.LOCAL_GUARDRAILS
+
+    clock.advance(10)
+    assert controller.evaluate() == OverloadMode.NORMAL
+
+
+def test_recovery_needs_signals_below_the_recovery_threshold() -> None:
+    clock = FakeClock()
+    controller = _controller(clock, latency_thresholds_ms=[100_000, 200_000, 300_000])
+    turns = [controller.track_turn() for _ in range(2)]
+    for turn in turns:
+        turn.__enter__()
+    turns[0].__exit__(None, None, None)
+
+    # one turn in flight is not below 0.5 * 2
+    clock.advance(30)
+    assert controller.evaluate() == OverloadMode.LOCAL_GUARDRAILS
+
+    turns[1].__exit__(None, None, None)
+    assert controller.evaluate() == OverloadMode.NORMAL
+
+
+def test_recovery_is_one_step_at_a_time() -> None:
+    clock = FakeClock()
+    controller = _controller(clock)
+    _run_turns(controller, clock, 5, latency_s=3.5)
+    assert controller.mode == OverloadMode.SHED
+
+    clock.advance(10)
+    _run_turns(controller, clock, 5, latency_s=0.1)
+    assert controller.mode == OverloadMode.FALLBACK_MODEL
+    _run_turns(controller, clock, 5, latency_s=0.1)
+    assert controller.mode == OverloadMode.FALLBACK_MODEL
+    clock.advance(10)
+    assert controller.evaluate() == OverloadMode.LOCAL_GUARDRAILS
+
+
+def test_shedding_lets_probes_through() -> None:
+    clock = FakeClock()
+    controller = _controller(clock)
+    _run_turns(controller, clock, 5, latency_s=3.5)
+    assert controller.mode == OverloadMode.SHED
+
+    admitted = [not controller.should_shed() for _ in range(8)]
+
+    assert admitted.count(True) == 2
+    assert controller.shed_turns == 6
+    assert controller.probe_turns == 2
+
+
+def test_shedding_ends_after_the_dwell_time_once_the_provider_recovered() -> None:
+    clock = FakeClock()
+    controller = _controller(clock)
+    _run_turns(controller, clock, 20, latency_s=3.5)
+    assert controller.mode == OverloadMode.SHED
+
+    # the slow turns are still in the latency window but predate the mode change
+    for _ in range(30):
+        if not controller.should_shed():
+            _run_turns(controller, clock, 1, latency_s=0.1)
+        clock.advance(0.5)
+
+    assert controller.mode < OverloadMode.SHED
+    assert controller.snapshot()["transitions"]["SHED->FALLBACK_MODEL"] == 1
+
+
+def test_slow_probes_keep_shedding() -> None:
+    clock = FakeClock()
+    controller = _controller(clock)
+    _run_turns(controller, clock, 5, latency_s=3.5)
+    assert controller.mode == OverloadMode.SHED
+
+    for _ in range(40):
+        if not controller.should_shed():
+            _run_turns(controller, clock, 1, latency_s=3.5)
+
+    assert controller.mode == OverloadMode.SHED
+
+
+def test_steady_slow_provider_does_not_flap() -> None:
+    clock = FakeClock()
+    controller = OverloadController(
+        inflight_thresholds=[32, 64, 128],
+        latency_thresholds_ms=[8000, 15000, 30000],
+        recovery_ratio=0.7,
+        min_dwell_s=10,
+        latency_window_s=60,
+        clock=clock,
+    )
+
+    # one turn every 12 s, each taking 20 s
+    running: list[tuple[float, Any]] = []
+    modes = []
+    for second in range(800):
+        for finish, turn in [r for r in running if r[0] <= clock.now]:
+            turn.__exit__(None, None, None)
+            running.remove((finish, turn))
+        if second % 12 == 0:
+            turn = controller.track_turn()
+            turn.__enter__()
+            running.append((clock.now + 20, turn))
+        modes.append(controller.evaluate())
+        clock.advance(1)
+
+    first = modes.index(OverloadMode.FALLBACK_MODEL)
+    assert set(modes[first:]) == {OverloadMode.FALLBACK_MODEL}
+    assert controller.snapshot()["transitions"] == {"NORMAL->FALLBACK_MODEL": 1}
+
+
+def test_latency_driven_mode_recovers_once_traffic_is_gone() -> None:
+    clock = FakeClock()
+    controller = _controller(clock)
+    _run_turns(controller, clock, 5, latency_s=2.5)
+    assert controller.mode == OverloadMode.FALLBACK_MODEL
+
+    # too few turns to tell, held
+    clock.advance(30)
+    assert controller.evaluate() == OverloadMode.FALLBACK_MODEL
+
+    # nothing seen for the latency window
+    clock.advance(31)
+    assert controller.evaluate() == OverloadMode.LOCAL_GUARDRAILS
+
+
+def test_snapshot_reports_the_recovered_mode() -> None:
+    clock = FakeClock()
+    controller = _controller(clock)
+    _run_turns(controller, clock, 5, latency_s=3.5)
+    assert controller.snapshot()["mode"] == "SHED"
+
+    clock.advance(61)
+
+    assert controller.snapshot()["mode"] == "FALLBACK_MODEL"
+
+
+def test_disabled_controller_stays_normal() -> None:
+    clock = FakeClock()
+    controller = OverloadController(
+        inflight_thresholds=[1, 2, 3], latency_thresholds_ms=[1, 2, 3], enabled=False, clock=clock
+    )
+
+    _run_turns(controller, clock, 10, latency_s=5)
+
+    assert controller.mode == OverloadMode.NORMAL
+    assert not controller.should_shed()